@@ -1,49 +1,200 @@
 from manim import *
 from manim_slides import Slide
 import numpy as np
-import scipy.interpolate
+from trajectories import ModuliGrid, TrajectoryBundle
+from mobjects import SweepTrace, SweepDots
+from datasets import loadGroup, loadSamples
+from profiling import Profiler
+import texcache
+import imagecache
+from frames import holdUnchangedFrames
+from encoding import encodeInBackground
+from lifecycle import SectionScope, saveReport
+import os
+
+SECTIONS = ['A_Title', 'B_TOC', 'C_ManimIntro', 'D_WhyManim',
+            'E_IntroToString1', 'F_IntroToString2', 'G_KahlerConeAxion', 'H_Conclusion']
 
 class Slides(Slide):
+    # names of the sections to render, None for the whole deck
+    sections = None
+    # rasterize everything below the lowest moving layer once per animation
+    composite = True
+    # KahlerConeMF arguments replacing the deck's own in G_KahlerConeAxion
+    kahler_cone = None
+    # how far (in output pixels) traced paths may deviate from the sampled trajectory
+    # when merging corners; 0 keeps one corner per frame
+    trace_tolerance = 0.5
+    profiler = None
+    # reversed clips are made on demand by render.py --reversed
+    skip_reversing = True
+    # preview render: every wait (including between slides) shrinks to a single frame
+    draft = False
+    # reuse the previous frame instead of rasterizing when nothing moving has changed
+    hold_frames = True
+    # raw frames queued for the encoder thread; 0 encodes on the render thread
+    encode_queue = 8
+    # section being rendered; collects what it adds so it can be released after its wipe
+    scope = None
+
+    def get_moving_mobjects(self, *animations):
+        # manim redraws everything after the first moving mobject each frame; keep
+        # only what actually moves plus whatever is drawn at or above the lowest
+        # z_index among the drawn parts of it, the rest goes into the cached static
+        # frame. A member is live when it is animated, in the foreground or has
+        # updaters of its own (a group merely containing updating numbers is not)
+        moving = super().get_moving_mobjects(*animations)
+        if not self.composite:
+            return moving
+        roots = [a.mobject for a in animations] + [m for m in moving if m.updaters]
+        live = {id(m) for mob in roots + self.foreground_mobjects for m in mob.get_family()}
+        drawn = [m.z_index for m in moving if id(m) in live
+                 and isinstance(m, (VMobject, PMobject, AbstractImageMobject)) and m.has_points()]
+        floor = min(drawn, default=None)
+        return [m for m in moving if id(m) in live or (floor is not None and m.z_index >= floor)]
+
+    def add(self, *mobjects):
+        if self.scope is not None:
+            self.scope.track(mobjects)
+        return super().add(*mobjects)
+
+    def wait(self, duration=DEFAULT_WAIT_TIME, *args, **kwargs):
+        if self.draft:
+            duration = min(duration, 1 / config.frame_rate)
+        return super().wait(duration, *args, **kwargs)
+
+    def play(self, *args, **kwargs):
+        # images about to be shown (e.g. by FadeIn) are not in self.mobjects yet
+        imagecache.observe(self.mobjects + [a.mobject for a in args if getattr(a, 'mobject', None) is not None])
+        if self.profiler is None:
+            super().play(*args, **kwargs)
+        else:
+            with self.profiler.span('play'):
+                super().play(*args, **kwargs)
+        imagecache.observe(self.mobjects)
+
     def construct(self):
+        texcache.install()
+        imagecache.install()
+        if self.hold_frames:
+            holdUnchangedFrames(self)
+        if self.encode_queue:
+            encodeInBackground(self, self.encode_queue)
+        # SLIDES_PROFILE=trace_{scene}.json records updater and play() timings,
+        # SLIDES_PROFILE_ALLOC=1 adds allocated bytes per call
+        if os.environ.get('SLIDES_PROFILE'):
+            self.profiler = Profiler(self, os.environ['SLIDES_PROFILE'].format(scene=type(self).__name__),
+                                     allocations=os.environ.get('SLIDES_PROFILE_ALLOC') == '1')
+        # SLIDES_MEMORY=memory_{scene}.json saves the per-section memory report
+        memory = []
+
         def formatText(string, scale, color):
             return Text(string).set_color(color).scale(scale)
         
         def makeEllipse(color):
             return Ellipse(width=2.5, height=2.5, fill_opacity=0.5, color=color, stroke_width=10)
             
+        def instrument(name, updater):
+            return updater if self.profiler is None else self.profiler.wrap(name, updater)
+
         def parametricUpdater(f, g, ax, t):
-            return lambda a: a.move_to(ax.c2p(f(t.get_value()), g(t.get_value())))
+            return instrument('parametricUpdater',
+                              lambda a: a.move_to(ax.c2p(f(t.get_value()), g(t.get_value()))))
 
-        def update_path(path, dot):
-                previous_path = path.copy()
-                previous_path.add_points_as_corners([dot.get_center()])
-                path.become(previous_path)
+        def pathUpdater(position):
+            return instrument('pathUpdater', lambda p: p.add_corner(position()))
 
-        def pathUpdater(dot):
-            return lambda p: update_path(p, dot)
+        def cloudUpdater(trackers, bundles, ax, x_cols, y_cols):
+            # every tracker's columns at once, mapped through the (linear) axes in one step
+            def positions():
+                origin, ex, ey = [ax.c2p(*c) for c in [(0, 0), (1, 0), (0, 1)]]
+                rows = np.array([b(t.get_value()) for b, t in zip(bundles, trackers)])
+                return (origin + np.outer(rows[:, x_cols].ravel(), ex - origin)
+                        + np.outer(rows[:, y_cols].ravel(), ey - origin))
+            return positions, instrument('cloudUpdater', lambda c: c.move_dots(positions()))
 
         def sweepCurveSetup(vt, ax, x, y, color=WHITE):
             init = ax.coords_to_point(x(vt.get_value()), y(vt.get_value()))
             dot = Dot(point=init, color=color)
             dot.z_index = 2
             dot.add_updater(parametricUpdater(x, y, ax, vt))
-            path = VMobject(stroke_color=color)
-            path.set_points_as_corners([dot.get_center(), dot.get_center()])
-            path.add_updater(pathUpdater(dot))
+            tolerance = self.trace_tolerance * config.frame_width / config.pixel_width
+            path = SweepTrace(dot.get_center(), tolerance=tolerance, stroke_color=color)
+            path.add_updater(pathUpdater(dot.get_center))
             path.z_index = 2
             
             return dot, path
+
+        def cloudSweepSetup(trackers, bundles, ax, x_cols, y_cols, colors):
+            # one SweepDots holding a dot per (tracker, column) pair, plus a traced path per dot
+            positions, updater = cloudUpdater(trackers, bundles, ax, x_cols, y_cols)
+            dots = SweepDots(positions(), colors)
+            dots.set_z_index(2)
+            dots.add_updater(updater)
+            tolerance = self.trace_tolerance * config.frame_width / config.pixel_width
+            paths = []
+            for i, color in enumerate(colors):
+                path = SweepTrace(dots.positions[i], tolerance=tolerance, stroke_color=color)
+                path.add_updater(pathUpdater(lambda i=i: dots.positions[i]))
+                path.z_index = 2
+                paths.append(path)
             
+            return dots, paths
+
+        def heatmapImage(field, ax, x_range, y_range, colors=(BLUE_E, GREEN, YELLOW)):
+            # field sampled on a (rows, cols) grid, top row at y_range's maximum; NaN is transparent
+            valid = np.isfinite(field)
+            lo, hi = np.nanmin(field), np.nanmax(field)
+            level = np.where(valid, (field - lo) / ((hi - lo) or 1), 0)
+            stops = np.linspace(0, 1, len(colors))
+            rgb = np.array([color_to_rgb(c) for c in colors])
+            pixels = np.zeros((*field.shape, 4), dtype=np.uint8)
+            for c in range(3):
+                pixels[..., c] = 255 * np.interp(level, stops, rgb[:, c])
+            pixels[..., 3] = 255 * valid
+            image = ImageMobject(pixels)
+            corner, opposite = ax.c2p(x_range[0], y_range[0]), ax.c2p(x_range[1], y_range[1])
+            image.stretch_to_fit_width(opposite[0] - corner[0]).stretch_to_fit_height(opposite[1] - corner[1])
+            return image.move_to((corner + opposite) / 2)
+
         def KahlerConeMF(paths, kahler_vertices, stretched_vertices, 
-                         x_range, y_range, kx_range, ky_range, num_axions):
+                         x_range, y_range, kx_range, ky_range, num_axions,
+                         samples=None, kahler_paths=None, heatmap=None, grid_shape=256):
+            # samples: dataset directory whose rays, taken together as scattered points over
+            # (k_1, k_2), are interpolated on a grid_shape grid spanning the k axes (cached);
+            # kahler_paths then replaces the rays in `paths` by waypoint lists in (k_1, k_2),
+            # and heatmap=('x', j) paints log10(m_a) of axion j (('y', j): log10(f)) over the cone
             header = Title("Axion Parameters as Function of Moduli Space", color=WHITE)
             self.add(header.to_edge(UP))
             self.next_slide()
             
+            if samples is None and (kahler_paths is not None or heatmap is not None):
+                raise ValueError('kahler_paths and heatmap need samples')
+            grid = None
+            if samples is not None:
+                points, columns = loadSamples(samples, num_axions)
+                grid = ModuliGrid.fromSamples(
+                    points[:, :2], np.hstack([columns['x'], columns['y']]), grid_shape,
+                    bounds=[kx_range[:2], ky_range[:2]], cache=texcache.cacheDir('grids'))
+
             # import axion data
-            xs = [[np.loadtxt(f'{p}/x_{i+1}.txt') for i in range(num_axions)] for p in paths]
-            ys = [[np.loadtxt(f'{p}/y_{i+1}.txt') for i in range(num_axions)] for p in paths]
-            ks = np.array([[np.loadtxt(f'{p}/k_{i+1}.txt') for i in range(2)] for p in paths])
+            if kahler_paths is None:
+                groups = [loadGroup(p) for p in paths]
+                xs = [g['x'][:num_axions] for g in groups]
+                ys = [g['y'][:num_axions] for g in groups]
+                ks = np.array([g['k'][:2] for g in groups])
+                params = [row[0] for row in ks]
+            else:
+                xs, ys, ks = [], [], []
+                for waypoints in kahler_paths:
+                    points, values = grid.path(waypoints)
+                    if np.isnan(values).any():
+                        raise ValueError(f'path {waypoints} leaves the sampled region of {samples}')
+                    xs.append(values[:, :num_axions].T)
+                    ys.append(values[:, num_axions:].T)
+                    ks.append(points.T)
+                ks = np.array(ks)
+                params = [np.linspace(0, 1, ks.shape[-1])] * len(ks)
 
             # generate axes
             plot_ax = Axes(
@@ -79,23 +230,25 @@ class Slides(Slide):
             s_cone.set_fill(PURPLE_A, opacity=0.5)
             s_cone.z_index = 1
 
-            # interpolate
-            x_fs = [[scipy.interpolate.interp1d(row2[0], x, bounds_error=False, fill_value=x[-1]) for x in row1] for row1, row2 in zip(xs, ks)]
-            y_fs = [[scipy.interpolate.interp1d(row2[0], y, bounds_error=False, fill_value=y[-1]) for y in row1] for row1, row2 in zip(ys, ks)]
-            k_fs = [[scipy.interpolate.interp1d(row2[0], k, bounds_error=False, fill_value=k[-1]) for k in row1] for row1, row2 in zip(ks, ks)]
+            # interpolate (one bundle per ray, shared by all of that ray's updaters)
+            bundles = [TrajectoryBundle(t, x=row1.T, y=row2.T, k=row3.T)
+                       for t, row1, row2, row3 in zip(params, xs, ys, ks)]
+            x_cols, y_cols = [np.arange(num_axions) + bundles[0].slices[n].start for n in 'xy']
+            k_cols = np.arange(2) + bundles[0].slices['k'].start
 
-            # set up moving dots
-            ts = [ValueTracker(row[0][0]) for row in ks]
-            colors = [BLUE, RED, GREEN, PURPLE]
-            xy_dots_paths = [[sweepCurveSetup(t, plot_ax, f, g, color=c) for f, g in zip(row1, row2)] for t, c, row1, row2 in zip(ts, colors, x_fs, y_fs)]
-            k_dots_paths = [sweepCurveSetup(t, k_ax, row[0], row[1], color=c) for t, row, c in zip(ts, k_fs, colors)]
+            # set up moving dots, one point cloud per axes
+            ts = [ValueTracker(t[0]) for t in params]
+            colors = [[BLUE, RED, GREEN, PURPLE][i % 4] for i in range(len(ks))]
+            xy_dots, xy_paths = cloudSweepSetup(
+                ts, bundles, plot_ax, x_cols, y_cols, [c for c in colors for _ in range(num_axions)])
+            k_dots, k_paths = cloudSweepSetup(ts, bundles, k_ax, k_cols[:1], k_cols[1:2], colors)
 
             # animate
             self.wait(1)
             self.next_slide()
             self.add(
                 *ax_related, 
-                *[c for a in xy_dots_paths for b in a for c in b], *[b for a in k_dots_paths for b in a],
+                xy_dots, *xy_paths, k_dots, *k_paths,
                 *header_text_ob)
             self.wait(1)
             self.next_slide()
@@ -103,8 +256,17 @@ class Slides(Slide):
             self.next_slide()
             self.play(FadeIn(s_cone))
             self.next_slide()
-            for t, row in zip(ts, ks):
-                self.play(t.animate.set_value(row[0][-1]), run_time=5)
+            if heatmap is not None:
+                name, j = heatmap
+                kx = np.linspace(*kx_range[:2], grid_shape)
+                ky = np.linspace(*ky_range[:2], grid_shape)[::-1]
+                field = grid(np.stack(np.meshgrid(kx, ky), axis=-1))[..., (0 if name == 'x' else num_axions) + j]
+                heat = heatmapImage(field, k_ax, kx_range, ky_range)
+                heat.z_index = 0.5
+                self.play(FadeIn(heat))
+                self.next_slide()
+            for t, param in zip(ts, params):
+                self.play(t.animate.set_value(param[-1]), run_time=5)
                 self.next_slide()
             self.wait()
         
@@ -361,13 +523,13 @@ class Slides(Slide):
             self.next_slide()
         
         def F_IntroToString2():
-            path = './h11_2_112823/circle'
-            thetas = np.loadtxt(f'{path}/theta.txt')
-            ms = np.loadtxt(f'{path}/m.txt')
-            fs = np.loadtxt(f'{path}/f.txt')
-            ks = np.loadtxt(f'{path}/k.txt')
-            div_vols = np.loadtxt(f'{path}/div_vols.txt')
-            metrics = 1e5 * np.loadtxt(f'{path}/metrics.txt')
+            data = loadGroup('./h11_2_112823/circle')
+            thetas = data['theta']
+            ms = data['m']
+            fs = data['f']
+            ks = data['k']
+            div_vols = data['div_vols']
+            metrics = 1e5 * data['metrics']
             
             header = Title("String \& Axions in 30 s, Pt 2", color=WHITE)
             self.add(header.to_edge(UP))
@@ -380,11 +542,12 @@ class Slides(Slide):
             # headlines = Group(*[Text(t) for t in header_text]).arrange(RIGHT, buff=2).next_to(
             #     header, DOWN).scale_to_fit_width(13)
             
-            ms_f = [scipy.interpolate.interp1d(thetas, m, bounds_error=False, fill_value=m[-1]) for m in ms.T]
-            fs_f = [scipy.interpolate.interp1d(thetas, f, bounds_error=False, fill_value=f[-1]) for f in fs.T]
-            ks_f = [scipy.interpolate.interp1d(thetas, k, bounds_error=False, fill_value=k[-1]) for k in ks.T]
-            div_vols_f = [scipy.interpolate.interp1d(thetas, d, bounds_error=False, fill_value=d[-1]) for d in div_vols.T]
-            metrics_f = [scipy.interpolate.interp1d(thetas, e, bounds_error=False, fill_value=e[-1]) for e in metrics.T]
+            bundle = TrajectoryBundle(thetas, m=ms, f=fs, k=ks, div_vols=div_vols, metrics=metrics)
+            ms_f = [bundle.f('m', i) for i in range(ms.shape[1])]
+            fs_f = [bundle.f('f', i) for i in range(fs.shape[1])]
+            ks_f = [bundle.f('k', i) for i in range(ks.shape[1])]
+            div_vols_f = [bundle.f('div_vols', i) for i in range(div_vols.shape[1])]
+            metrics_f = [bundle.f('metrics', i) for i in range(metrics.shape[1])]
             
             k_ax = Axes(
                 x_range=(-2.5, -1, 0.5), 
@@ -402,7 +565,9 @@ class Slides(Slide):
             elems = [DecimalNumber(0, num_decimal_places=2, include_sign=True, unit=None).scale(0.75)
                      for _ in range(4)]
             for elem, f in zip(elems, metrics_f):
-                elem.add_updater(lambda d, f=f: d.set_value(f(ti.get_value())))
+                elem.add_updater(instrument('metricUpdater',
+                                            lambda d, f=f: d.set_value(f(ti.get_value())).set_z_index(2)))
+                elem.set_z_index(2)
             matrix = MobjectMatrix([[elems[0], elems[1]], [elems[2], elems[3]]]).scale(3)
             
             nls = [NumberLine(
@@ -417,7 +582,9 @@ class Slides(Slide):
             
             div_vol_dots = [Dot().set_color(RED) for _ in nls]
             for dot, f, nl in zip(div_vol_dots, div_vols_f, nls):
-                dot.add_updater(lambda d, f=f, nl=nl: d.move_to(nl.number_to_point(f(ti.get_value()))))
+                dot.add_updater(instrument('divVolUpdater',
+                                           lambda d, f=f, nl=nl: d.move_to(nl.number_to_point(f(ti.get_value())))))
+                dot.z_index = 2
             
             # masterGroup = Group(k_ax, middle, plot_ax).arrange(
                 # RIGHT, buff=2).scale_to_fit_width(13).next_to(headlines, DOWN)
@@ -450,18 +617,12 @@ class Slides(Slide):
             self.add(*div_vol_dots)
             self.play(ti.animate.set_value(2 * np.pi), run_time=10, rate_func=linear)
             self.next_slide()
-            # self.wait()
-            
-            # self.wipe(self.mobjects_without_canvas, [])
-            # for obj in div_vol_dots + [k_dot, mf_dot_1, mf_dot_2] + elems:
-                # obj.remove()
-                
             self.wipe(self.mobjects_without_canvas, [])
             self.next_slide()
         
         def G_KahlerConeAxion():
             self.wait(1)
-            KahlerConeMF(
+            KahlerConeMF(**(self.kahler_cone or dict(
                 paths=[f'./h11_3_112823/ray{i+1}' for i in range(3)],
                 kahler_vertices=[[0,0], [11,0], [11,11]], 
                 stretched_vertices=[[3,2], [11,2], [11,10]], 
@@ -469,7 +630,7 @@ class Slides(Slide):
                 y_range=[14.8, 15.6, 0.2], 
                 kx_range=[0, 11, 1], 
                 ky_range=[0, 11, 1],
-                num_axions=3)
+                num_axions=3)))
             
             self.next_slide()
             self.wipe(self.mobjects_without_canvas, [])
@@ -508,13 +669,31 @@ class Slides(Slide):
         
         self.wait_time_between_slides = 0.5
         
-        A_Title()
-        B_TOC()
-        C_ManimIntro()
-        D_WhyManim()
-        E_IntroToString1()
-        F_IntroToString2()
-        G_KahlerConeAxion()
-        H_Conclusion()
+        sections = [A_Title, B_TOC, C_ManimIntro, D_WhyManim,
+                    E_IntroToString1, F_IntroToString2, G_KahlerConeAxion, H_Conclusion]
+        for section in sections:
+            if self.sections is None or section.__name__ in self.sections:
+                if self.profiler is not None:
+                    self.profiler.section = section.__name__
+                texcache.beginSection(section.__name__, __file__)
+                with SectionScope(self, section.__name__) as scope:
+                    section()
+                memory.append(scope.report)
+                texcache.endSection()
+        
+        if self.sections is None or SECTIONS[-1] in self.sections:
+            self.play(FadeIn(Text('Thanks!').scale(2)))
         
-        self.play(FadeIn(Text('Thanks!').scale(2)))
\ No newline at end of file
+        imagecache.save()
+        if self.profiler is not None:
+            self.profiler.save()
+        if os.environ.get('SLIDES_MEMORY'):
+            saveReport(memory, os.environ['SLIDES_MEMORY'].format(scene=type(self).__name__))
+
+# render.py renders each section as its own scene, e.g. SLIDES_SECTION=B_TOC -> Slides_B_TOC,
+# or Draft_B_TOC with SLIDES_DRAFT=1
+if os.environ.get('SLIDES_SECTION') in SECTIONS:
+    name = os.environ['SLIDES_SECTION']
+    prefix = 'Draft' if os.environ.get('SLIDES_DRAFT') == '1' else 'Slides'
+    globals()[f'{prefix}_{name}'] = type(
+        f'{prefix}_{name}', (Slides,), {'sections': [name], 'draft': prefix == 'Draft', '__module__': __name__})
@@ -0,0 +1,145 @@
+# Content-addressed slide video store shared by slides/Slides.json and slides.html.
+# Files are keyed by the hash manim-slides already uses as their name and are
+# hardlinked in from the per-section render folders instead of copied (remuxed
+# instead when their index is not at the front, so playback can start before the
+# whole clip has loaded); reversed clips are only made for the slides asked for.
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+STORE = 'slides_assets'
+TEMPLATE = 'slides_template.html'
+PRELOAD = """<script>
+      // buffer the background videos of the next {count} slides (reveal creates them
+      // for every slide within viewDistance), so each transition starts playing at once
+      Reveal.configure({{viewDistance: {count} + 1, mobileViewDistance: {count} + 1}});
+      function preloadAhead() {{
+        const current = Reveal.getSlidePastCount();
+        for (const slide of Reveal.getSlides().slice(current + 1, current + 1 + {count})) {{
+          const background = Reveal.getSlideBackground(slide);
+          const video = background && background.querySelector('video');
+          if (video && video.preload !== 'auto') {{
+            video.preload = 'auto';
+            if (video.networkState === video.NETWORK_EMPTY) video.load();
+          }}
+        }}
+      }}
+      Reveal.on('ready', preloadAhead);
+      Reveal.on('slidechanged', preloadAhead);
+    </script>"""
+SECTION = """<section
+              data-background-size='contain'
+              data-background-color="{color}"
+              data-background-video="{file}"
+              {extra}>
+            </section>"""
+
+
+def link(src, dst):
+    # hardlink, falling back to a copy across filesystems; an existing file with
+    # the same hash name already holds the same content
+    if os.path.exists(dst):
+        return dst
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def isFaststart(path):
+    # top-level MP4 boxes: the index (moov) comes before the media data (mdat)
+    with open(path, 'rb') as fh:
+        while True:
+            header = fh.read(8)
+            if len(header) < 8:
+                return False
+            size, kind = int.from_bytes(header[:4], 'big'), header[4:]
+            if kind == b'moov':
+                return True
+            if kind == b'mdat' or size == 0:
+                return False
+            if size == 1:
+                size = int.from_bytes(fh.read(8), 'big') - 8
+            fh.seek(size - 8, os.SEEK_CUR)
+
+
+def faststart(src, dst):
+    # remux (no re-encode) a clip whose index is not at the front in place, then link
+    # it, so the render folder and the store keep sharing one file
+    if os.path.exists(dst) and isFaststart(dst):
+        return dst
+    if not isFaststart(src):
+        root, ext = os.path.splitext(src)
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', src, '-c', 'copy',
+                        '-movflags', '+faststart', f'{root}.part{ext}'], check=True)
+        os.replace(f'{root}.part{ext}', src)
+    if os.path.exists(dst):
+        os.remove(dst)
+    return link(src, dst)
+
+
+def reversedName(path):
+    root, ext = os.path.splitext(path)
+    return f'{root}_reversed{ext}'
+
+
+def storeDeck(deck, store=STORE):
+    # point every slide at the store; rev_file falls back to the forward clip
+    # until reverse() has produced the reversed one
+    os.makedirs(store, exist_ok=True)
+    for slide in deck['slides']:
+        src = slide['file']
+        slide['file'] = faststart(src, f'{store}/{os.path.basename(src)}')
+        if os.path.exists(reversedName(slide['file'])):
+            slide['rev_file'] = reversedName(slide['file'])
+        elif os.path.exists(slide.get('rev_file', '')) and slide['rev_file'] != src:
+            slide['rev_file'] = faststart(slide['rev_file'], reversedName(slide['file']))
+        else:
+            slide['rev_file'] = slide['file']
+    return deck
+
+
+def reverseClip(path):
+    # written under a temporary name so a concurrent or interrupted run never
+    # leaves a truncated clip where storeDeck would pick it up
+    out = reversedName(path)
+    if not os.path.exists(out):
+        root, ext = os.path.splitext(out)
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', path,
+                        '-vf', 'reverse', '-movflags', '+faststart', f'{root}.part{ext}'], check=True)
+        os.replace(f'{root}.part{ext}', out)
+    return out
+
+
+def reverse(deck, indices=None, jobs=None):
+    # make the reversed clips for the given slide indices (all when None), several at once
+    slides = [s for i, s in enumerate(deck['slides']) if indices is None or i in indices]
+    with ThreadPoolExecutor(jobs) as pool:
+        for slide, out in zip(slides, pool.map(reverseClip, [s['file'] for s in slides])):
+            slide['rev_file'] = out
+    return deck
+
+
+def prune(deck, store=STORE):
+    # drop store files no slide refers to any more
+    used = {os.path.basename(s[k]) for s in deck['slides'] for k in ['file', 'rev_file']}
+    for name in os.listdir(store):
+        if name.endswith('.mp4') and name not in used:
+            os.remove(f'{store}/{name}')
+
+
+def writeHtml(deck, path, template=TEMPLATE, preload=2):
+    sections = []
+    for i, slide in enumerate(deck['slides']):
+        extra = 'data-background-video-loop' if slide['loop'] else ''
+        if i == 0:
+            extra = (extra + ' data-background-video-muted').strip()
+        sections.append(SECTION.format(
+            color=deck.get('background_color', 'black'), file=slide['file'], extra=extra))
+    with open(template) as fh:
+        html = fh.read()
+    with open(path, 'w') as fh:
+        fh.write(html.replace('<!-- SLIDES -->', ''.join(sections))
+                 .replace('<!-- PRELOAD -->', PRELOAD.format(count=preload)))
@@ -0,0 +1,135 @@
+# Render the KahlerConeMF sweep (section G_KahlerConeAxion) once per dataset listed
+# in a manifest, in a pool of worker processes, each job as its own mini-deck:
+# slides/Batch_<name>.json for manim-slides and batch/<name>.html, with the clips
+# in batch/assets. Jobs whose section code, parameters and data are unchanged
+# since their last render are skipped.
+#
+#   python batch.py manifest.json [--jobs N] [--quality high_quality] [--force]
+#
+# manifest.json: KahlerConeMF arguments shared by every job, and per job the
+# arguments that differ; "dataset" stands for paths=[every ray of that dataset]
+#   {"defaults": {"kahler_vertices": [[0,0], [11,0], [11,11]], ...},
+#    "jobs": [{"name": "h11_3_112823", "dataset": "./h11_3_112823", "num_axions": 3},
+#             {"name": "h11_2_112123", "dataset": "./h11_2_112123", "num_axions": 2, ...}]}
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assets import storeDeck, writeHtml
+from datasets import convert, currentDataset, groupNames
+from render import FOLDER, dataFiles, fingerprints, hashFiles, isCached
+
+SCENE = 'Batch'
+SECTION = 'G_KahlerConeAxion'
+OUTPUT = 'batch'
+CACHE = f'{OUTPUT}/cache.json'
+
+
+def loadJobs(path):
+    with open(path) as fh:
+        manifest = json.load(fh)
+    jobs = []
+    for job in manifest['jobs']:
+        job = dict(manifest.get('defaults', {}), **job)
+        name = job.pop('name', None) or os.path.basename(os.path.normpath(job['dataset']))
+        if not re.fullmatch(r'\w+', name):
+            raise ValueError(f'job name {name!r} must be letters, digits and underscores')
+        dataset = job.pop('dataset', None)
+        if dataset is not None:
+            job['paths'] = [f'{dataset.rstrip("/")}/{g}' for g in groupNames(dataset)]
+        jobs.append(dict(name=name, kahler_cone=job))
+    return jobs
+
+
+def prepare(jobs):
+    # convert every dataset the jobs read to .axd once (again when its text files
+    # have changed since), so each job memory-maps current data
+    for job in jobs:
+        cone = job['kahler_cone']
+        roots = {os.path.dirname(os.path.normpath(p)) for p in cone['paths']}
+        if cone.get('samples'):
+            roots.add(os.path.normpath(cone['samples']))
+        for root in roots:
+            if os.path.isdir(root) and currentDataset(root) is None:
+                convert(root)
+
+
+def fingerprint(job, section):
+    # the section's own fingerprint (code + shared code + modules) + this job's arguments and data
+    cone = job['kahler_cone']
+    strings = cone['paths'] + ([cone['samples']] if cone.get('samples') else [])
+    h = hashlib.sha256(section.encode())
+    h.update(json.dumps(cone, sort_keys=True).encode())
+    h.update(hashFiles(dataFiles(strings)).encode())
+    return h.hexdigest()
+
+
+def renderJob(job, quality):
+    # runs in a pool worker; the worker's Text/Tex outline caches carry over between its jobs
+    from manim import tempconfig
+    import Slides
+
+    scene = type(f"{SCENE}_{job['name']}", (Slides.Slides,), {
+        'sections': [SECTION], 'kahler_cone': job['kahler_cone'], '__module__': Slides.__name__})
+    with tempconfig({'quality': quality, 'media_dir': 'media',
+                     'progress_bar': 'none', 'verbosity': 'WARNING'}):
+        scene().render()
+    return job['name']
+
+
+def publish(name, store=f'{OUTPUT}/assets'):
+    with open(f'{FOLDER}/{SCENE}_{name}.json') as fh:
+        deck = storeDeck(json.load(fh), store)
+    for slide in deck['slides']:
+        for key in ['file', 'rev_file']:
+            slide[key] = os.path.relpath(slide[key], OUTPUT)
+    writeHtml(deck, f'{OUTPUT}/{name}.html')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('manifest')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--quality', default='high_quality')
+    parser.add_argument('--force', action='store_true', help='ignore the render cache')
+    args = parser.parse_args(argv)
+
+    jobs = loadJobs(args.manifest)
+    prepare(jobs)
+    os.makedirs(OUTPUT, exist_ok=True)
+    cache = {}
+    if os.path.exists(CACHE):
+        with open(CACHE) as fh:
+            cache = json.load(fh)
+    section = fingerprints([args.quality])[SECTION]
+    prints = {job['name']: fingerprint(job, section) for job in jobs}
+    todo = [job for job in jobs if args.force
+            or not isCached(job['name'], prints[job['name']], cache, scene=SCENE)]
+    for name in set(prints) - {job['name'] for job in todo}:
+        print(f'up to date {name}')
+
+    failed = []
+    with ProcessPoolExecutor(args.jobs) as pool:
+        futures = {pool.submit(renderJob, job, args.quality): job['name'] for job in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                failed.append(name)
+                print(f'failed {name}: {e}', file=sys.stderr)
+                continue
+            publish(name)
+            cache[name] = prints[name]
+            with open(CACHE, 'w') as fh:
+                json.dump(cache, fh, indent=2)
+            print(f'rendered {name}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
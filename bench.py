@@ -0,0 +1,165 @@
+# Headless render benchmarks: every section of Slides.py plus the KahlerConeMF
+# sweep on synthetic datasets of increasing size, one child process per case.
+#
+#   python bench.py run [-o bench.json] [--sizes 3x3x100 20x10x1000] [--quality low_quality]
+#   python bench.py compare bench.json baseline.json [--threshold 0.1]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from datasets import convert
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SIZES = ['3x3x100', '10x5x1000', '30x10x5000']  # rays x axions x samples per ray
+METRICS = ['wall', 'updaters', 'raster', 'encode', 'peak_rss_mb']
+
+
+def makeDataset(directory, rays, axions, samples, seed=0):
+    # smooth random trajectories laid out like h11_3_112823/ray*, plus the .axd file
+    rng = np.random.default_rng(seed)
+    s = np.linspace(0, 1, samples)
+    for r in range(rays):
+        path = f'{directory}/ray{r+1}'
+        os.makedirs(path, exist_ok=True)
+        start, end = rng.uniform(1, 10, 2), rng.uniform(1, 10, 2)
+        k = np.outer(1 - s, start) + np.outer(s, end)
+        for i in range(2):
+            np.savetxt(f'{path}/k_{i+1}.txt', k[:, i])
+        for i in range(axions):
+            a, b, w = rng.uniform(-1, 1, 3)
+            np.savetxt(f'{path}/x_{i+1}.txt', -125 + 150 * a * np.sin(2 * np.pi * w * s + b))
+            np.savetxt(f'{path}/y_{i+1}.txt', 15.2 + 0.3 * b * np.cos(2 * np.pi * w * s + a))
+    convert(directory)
+    return dict(
+        paths=[f'./{os.path.basename(directory)}/ray{r+1}' for r in range(rays)],
+        kahler_vertices=[[0,0], [11,0], [11,11]],
+        stretched_vertices=[[3,2], [11,2], [11,10]],
+        x_range=[-300, 50, 50],
+        y_range=[14.8, 15.6, 0.2],
+        kx_range=[0, 11, 1],
+        ky_range=[0, 11, 1],
+        num_axions=axions)
+
+
+def timed(cls, name, totals, key, count=None):
+    if not hasattr(cls, name):
+        return
+    method = getattr(cls, name)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            totals[key] += time.perf_counter() - start
+            if count is not None:
+                totals[count] += kwargs.get('num_frames', args[2] if len(args) > 2 else 1)
+    setattr(cls, name, wrapper)
+
+
+def runCase(spec):
+    # runs inside the child process, from a scratch directory
+    from manim import tempconfig
+    from manim.renderer.cairo_renderer import CairoRenderer
+    from manim.scene.scene import Scene
+    from manim.scene.scene_file_writer import SceneFileWriter
+    import Slides
+
+    totals = dict.fromkeys(['updaters', 'raster', 'encode', 'frames'], 0)
+    timed(Scene, 'update_mobjects', totals, 'updaters')
+    timed(CairoRenderer, 'update_frame', totals, 'raster')
+    timed(SceneFileWriter, 'write_frame', totals, 'encode', count='frames')
+    for name in ['close_partial_movie_stream', 'combine_to_movie']:
+        timed(SceneFileWriter, name, totals, 'encode')
+    timed(Slides.Slide, '_save_slides', totals, 'encode')
+
+    scene = type(spec['name'], (Slides.Slides,), {
+        'sections': [spec['section']], 'kahler_cone': spec.get('kahler_cone')})
+    with tempconfig({'quality': spec['quality'], 'media_dir': 'media', 'disable_caching': True,
+                     'progress_bar': 'none', 'verbosity': 'WARNING'}):
+        start = time.perf_counter()
+        scene().render()
+        wall = time.perf_counter() - start
+
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return dict(totals, wall=wall, fps=totals['frames'] / wall, peak_rss_mb=rss / 1024)
+
+
+def run(sizes, quality, sections):
+    from Slides import SECTIONS
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in ['images'] + [d for d in os.listdir(ROOT) if d.startswith('h11_')]:
+            os.symlink(f'{ROOT}/{name}', f'{scratch}/{name}')
+        specs = [dict(name=f'Bench_{s}', section=s) for s in sections or SECTIONS]
+        for size in sizes:
+            rays, axions, samples = map(int, size.split('x'))
+            cone = makeDataset(f'{scratch}/synthetic_{size}', rays, axions, samples)
+            specs.append(dict(name=f'Bench_KahlerConeMF_{size}', section='G_KahlerConeAxion',
+                              kahler_cone=cone))
+        for spec in specs:
+            spec['quality'] = quality
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '_case', json.dumps(spec)],
+                cwd=scratch, capture_output=True, text=True,
+                env=dict(os.environ, PYTHONPATH=ROOT, MPLBACKEND='Agg'))
+            if child.returncode != 0:
+                raise RuntimeError(f"{spec['name']} failed:\n{child.stderr}")
+            results[spec['name']] = json.loads(child.stdout.splitlines()[-1])
+            print(spec['name'], ' '.join(f'{k}={results[spec["name"]][k]:.3g}' for k in METRICS),
+                  file=sys.stderr)
+    return {'quality': quality, 'cases': results}
+
+
+def compare(current, baseline, threshold):
+    # a metric regresses when it grows by more than threshold relative to baseline
+    regressions = []
+    for name, base in baseline['cases'].items():
+        if name not in current['cases']:
+            continue
+        for key in METRICS:
+            old, new = base[key], current['cases'][name][key]
+            change = (new - old) / old if old else 0.0
+            flag = change > threshold
+            print(f'{name:40s} {key:12s} {old:10.3f} {new:10.3f} {change:+7.1%}{" REGRESSION" if flag else ""}')
+            if flag:
+                regressions.append((name, key))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run')
+    p.add_argument('-o', '--output', default='bench.json')
+    p.add_argument('--sizes', nargs='*', default=SIZES)
+    p.add_argument('--sections', nargs='*')
+    p.add_argument('--quality', default='low_quality')
+    p = sub.add_parser('compare')
+    p.add_argument('current')
+    p.add_argument('baseline')
+    p.add_argument('--threshold', type=float, default=0.1)
+    p = sub.add_parser('_case')
+    p.add_argument('spec')
+    args = parser.parse_args(argv)
+
+    if args.command == '_case':
+        print(json.dumps(runCase(json.loads(args.spec))))
+    elif args.command == 'run':
+        with open(args.output, 'w') as fh:
+            json.dump(run(args.sizes, args.quality, args.sections), fh, indent=2)
+    else:
+        with open(args.current) as fh, open(args.baseline) as gh:
+            return 1 if compare(json.load(fh), json.load(gh), args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
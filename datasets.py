@@ -0,0 +1,166 @@
+# Binary moduli-space datasets: one file per dataset directory, holding every
+# array under '<group>/<name>' plus JSON metadata, memory-mapped on load.
+#
+#   python datasets.py h11_3_112823 [h11_2_112823 ...]   ->  h11_3_112823.axd
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+import numpy as np
+
+MAGIC = b'AXIONDS1'
+ALIGN = 64
+
+
+def readTextGroup(path):
+    # x_1.txt, x_2.txt, ... -> 'x' stacked as (count, samples); plain m.txt -> 'm'
+    indexed, arrays = {}, {}
+    for name in sorted(os.listdir(path)):
+        match = re.fullmatch(r'(.+?)(?:_(\d+))?\.txt', name)
+        if match is None:
+            continue
+        key, i = match.groups()
+        if i is None:
+            arrays[key] = np.loadtxt(f'{path}/{name}')
+        else:
+            indexed.setdefault(key, {})[int(i)] = f'{path}/{name}'
+    for key, files in indexed.items():
+        arrays[key] = np.array([np.loadtxt(files[i]) for i in sorted(files)])
+    return arrays
+
+
+def describe(groups):
+    # h11 = number of Kahler parameters, num_axions = number of x / m columns
+    first = next(iter(groups.values()))
+    if 'x' in first:
+        h11, num_axions = len(first['k']), len(first['x'])
+        num_samples = first['k'].shape[-1]
+    else:
+        h11, num_axions = first['k'].shape[-1], first['m'].shape[-1]
+        num_samples = first['k'].shape[0]
+    return {'h11': h11, 'num_axions': num_axions, 'num_rays': len(groups),
+            'num_samples': num_samples, 'groups': list(groups)}
+
+
+def convert(directory, out=None):
+    directory = directory.rstrip('/')
+    out = out or f'{directory}.axd'
+    groups = {g: readTextGroup(f'{directory}/{g}') for g in sorted(os.listdir(directory))
+              if os.path.isdir(f'{directory}/{g}')}
+    meta = dict(describe(groups), name=os.path.basename(directory), sources=sourceStamps(directory))
+    return writeArrays(out, {f'{g}/{k}': a for g, group in groups.items() for k, a in group.items()}, meta)
+
+
+def sourceStamps(directory):
+    # size and mtime of every text file a dataset's .axd is built from
+    stamps = {}
+    for g in sorted(os.listdir(directory)):
+        if os.path.isdir(f'{directory}/{g}'):
+            for name in sorted(os.listdir(f'{directory}/{g}')):
+                if name.endswith('.txt'):
+                    stat = os.stat(f'{directory}/{g}/{name}')
+                    stamps[f'{g}/{name}'] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def writeArrays(out, arrays, meta):
+    # {'<group>/<name>': array} -> one .axd file, written under a temporary name
+    # and renamed so readers never see a partial file
+    table, offset = {}, 0
+    arrays = {name: np.ascontiguousarray(a, dtype='<f8') for name, a in arrays.items()}
+    for name, a in arrays.items():
+        table[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    header = json.dumps({'meta': meta, 'arrays': table}).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp = f'{out}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+        for name, a in arrays.items():
+            fh.seek(start + table[name]['offset'])
+            fh.write(a.tobytes())
+        fh.truncate(start + offset)
+    os.replace(tmp, out)
+    return out
+
+
+class Dataset:
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a dataset file')
+            size = int.from_bytes(fh.read(8), 'little')
+            header = json.loads(fh.read(size))
+        start = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+        self.path = path
+        self.meta = header['meta']
+        self.table = header['arrays']
+        self._mm = np.memmap(path, mode='r', dtype=np.uint8)
+        self._start = start
+
+    def __getitem__(self, name):
+        entry = self.table[name]
+        dtype = np.dtype(entry['dtype'])
+        lo = self._start + entry['offset']
+        hi = lo + dtype.itemsize * int(np.prod(entry['shape']))
+        return self._mm[lo:hi].view(dtype).reshape(entry['shape'])
+
+    def __contains__(self, name):
+        return name in self.table
+
+    def group(self, g):
+        return {n.split('/', 1)[1]: self[n] for n in self.table if n.split('/', 1)[0] == g}
+
+
+@lru_cache(maxsize=None)
+def openDataset(path, mtime=None):
+    # keyed on the file's mtime too, so a rebuilt file is opened afresh
+    return Dataset(path)
+
+
+def currentDataset(directory):
+    # <directory>.axd, unless its text files have changed since it was converted
+    # (then None, and they are read directly until it is converted again)
+    directory = os.path.normpath(directory)
+    path = f'{directory}.axd'
+    if not os.path.exists(path):
+        return None
+    dataset = openDataset(path, os.stat(path).st_mtime_ns)
+    if os.path.isdir(directory) and dataset.meta.get('sources') != sourceStamps(directory):
+        return None
+    return dataset
+
+
+def loadGroup(path):
+    # './h11_3_112823/ray1' -> {'x': ..., 'y': ..., 'k': ...}, from
+    # h11_3_112823.axd when it is up to date, else from the text files
+    root, g = os.path.split(os.path.normpath(path))
+    dataset = currentDataset(root)
+    if dataset is not None:
+        return dataset.group(g)
+    return readTextGroup(path)
+
+
+def groupNames(directory):
+    dataset = currentDataset(directory)
+    if dataset is not None:
+        return dataset.meta['groups']
+    directory = directory.rstrip('/')
+    return sorted(g for g in os.listdir(directory) if os.path.isdir(f'{directory}/{g}'))
+
+
+def loadSamples(directory, num_axions=None):
+    # every sample of every ray as scattered points of the Kahler cone:
+    # k -> (N, h11) points, x and y -> (N, num_axions) values
+    directory = directory.rstrip('/')
+    groups = [loadGroup(f'{directory}/{g}') for g in groupNames(directory)]
+    points = np.hstack([g['k'] for g in groups]).T
+    columns = {c: np.hstack([g[c][:num_axions] for g in groups]).T for c in ['x', 'y']}
+    return points, columns
+
+
+if __name__ == '__main__':
+    for d in sys.argv[1:]:
+        print(convert(d))
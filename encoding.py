@@ -0,0 +1,66 @@
+# Frames are handed to the movie writer on a background thread, so the encoder
+# (x264 via ffmpeg/PyAV, which releases the GIL while it works) runs while the next
+# frames are being rasterized. The queue is bounded to keep at most `depth` raw
+# frames in memory, and drained before an animation's partial movie file is closed.
+import queue
+import threading
+
+_DONE = object()
+
+
+class BackgroundWriter:
+    def __init__(self, file_writer, depth=8):
+        self.file_writer = file_writer
+        self.write_frame = file_writer.write_frame
+        self.queue = queue.Queue(depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _DONE:
+                    return
+                if self.error is None:
+                    self.write_frame(*item[0], **item[1])
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def put(self, *args, **kwargs):
+        if self.error is not None:
+            self.drain()
+        self.queue.put((args, kwargs))
+
+    def drain(self):
+        self.queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self):
+        self.drain()
+        self.queue.put(_DONE)
+        self.thread.join()
+
+
+def encodeInBackground(scene, depth=8):
+    file_writer = scene.renderer.file_writer
+    writer = BackgroundWriter(file_writer, depth)
+    end_animation, finish = file_writer.end_animation, file_writer.finish
+
+    def drained_end_animation(*args, **kwargs):
+        writer.drain()
+        return end_animation(*args, **kwargs)
+
+    def closed_finish(*args, **kwargs):
+        writer.close()
+        return finish(*args, **kwargs)
+
+    file_writer.write_frame = writer.put
+    file_writer.end_animation = drained_end_animation
+    file_writer.finish = closed_finish
+    return writer
@@ -0,0 +1,41 @@
+# Held-frame detection: within one animation, a frame whose moving mobjects are
+# in exactly the state they were in for the previous frame is not rasterized
+# again; the previous frame is handed to the movie writer as is.
+import hashlib
+import numpy as np
+
+ATTRS = ['points', 'fill_rgbas', 'stroke_rgbas', 'background_stroke_rgbas', 'stroke_width',
+         'background_stroke_width', 'sheen_factor', 'sheen_direction', 'z_index', 'pixel_array']
+
+
+def sceneState(mobjects):
+    # which mobjects are moving, and what their families look like; members are hashed
+    # by content, not identity, since e.g. DecimalNumber.set_value rebuilds its digits
+    h = hashlib.blake2b(digest_size=16)
+    for mob in mobjects:
+        h.update(id(mob).to_bytes(8, 'little'))
+        for m in mob.get_family():
+            h.update(type(m).__name__.encode())
+            h.update(len(m.submobjects).to_bytes(4, 'little'))
+            for attr in ATTRS:
+                value = getattr(m, attr, None)
+                if isinstance(value, np.ndarray):
+                    h.update(np.ascontiguousarray(value))
+                elif value is not None:
+                    h.update(repr(value).encode())
+    return h.digest()
+
+
+def holdUnchangedFrames(scene):
+    renderer = scene.renderer
+    render = renderer.render
+    last = [None]
+
+    def held(scene, time, moving_mobjects):
+        key = (renderer.num_plays, sceneState(moving_mobjects))
+        if key == last[0]:
+            renderer.add_frame(renderer.get_frame())
+            return
+        last[0] = key
+        render(scene, time, moving_mobjects)
+    renderer.render = held
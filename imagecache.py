@@ -0,0 +1,126 @@
+# Image cache for ImageMobject: the largest on-screen pixel height each source image
+# is shown at (per output resolution) is recorded under <media_dir>/cache/images, and
+# later runs decode a copy resampled once to that height instead of the full-size
+# source. The displayed size is unchanged: scale_to_resolution shrinks with the pixels.
+import hashlib
+import io
+import json
+import math
+import os
+import pathlib
+import weakref
+
+import numpy as np
+from PIL import Image
+from manim import config
+from manim.constants import DEFAULT_QUALITY, QUALITIES
+import manim.mobject.types.image_mobject as image_mobject
+from manim.utils.images import get_full_raster_image_path
+
+from texcache import _atomicWrite, cacheDir
+
+_decoded = {}
+_shown = weakref.WeakKeyDictionary()
+_largest = {}
+
+
+def _sourceKey(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()[:32]
+
+
+def _sizes(key):
+    try:
+        with open(os.path.join(cacheDir('images'), f'{key}.json')) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _compact(path, key, height, image_mode):
+    # the source resampled to `height` pixels, decoded once per section (see clear)
+    out = os.path.join(cacheDir('images'), f'{key}_{height}.png')
+    if (out, image_mode) not in _decoded:
+        if not os.path.exists(out):
+            with Image.open(path) as image:
+                width = max(1, round(image.width * height / image.height))
+                data = io.BytesIO()
+                image.convert('RGBA').resize((width, height), Image.LANCZOS).save(data, format='PNG')
+            _atomicWrite(out, data.getvalue())
+        with Image.open(out) as image:
+            _decoded[out, image_mode] = np.array(image.convert(image_mode))
+    return _decoded[out, image_mode]
+
+
+def _cachedInit(init):
+    def __init__(self, filename_or_array, scale_to_resolution=QUALITIES[DEFAULT_QUALITY]['pixel_height'],
+                 *args, **kwargs):
+        if not isinstance(filename_or_array, (str, pathlib.PurePath)):
+            return init(self, filename_or_array, scale_to_resolution, *args, **kwargs)
+        path = get_full_raster_image_path(filename_or_array)
+        key = _sourceKey(path)
+        target = _sizes(key).get(str(config.pixel_height))
+        with Image.open(path) as source:
+            height = source.height
+        image_mode = kwargs.get('image_mode', 'RGBA')
+        if target is None or target >= height:
+            init(self, path, scale_to_resolution, *args, **kwargs)
+            loaded = height
+        else:
+            pixels = _compact(path, key, target, image_mode)
+            init(self, pixels, scale_to_resolution * target / height, *args, **kwargs)
+            self.path = path
+            loaded = target
+        _shown[self] = dict(key=key, loaded=loaded, height=height, path=path, image_mode=image_mode)
+    return __init__
+
+
+def _restoreFullResolution(mob, entry):
+    # the layout now shows a cached copy larger than it was resampled to: put the
+    # source pixels back (same geometry, the points are untouched)
+    with Image.open(entry['path']) as image:
+        pixels = np.array(image.convert(entry['image_mode']))
+    if pixels.ndim == 2 or pixels.shape[-1] != 4:
+        pixels = np.array(Image.fromarray(pixels).convert('RGBA'))
+    if getattr(mob, 'invert', False):
+        pixels[:, :, :3] = 255 - pixels[:, :, :3]
+    mob.pixel_array = pixels
+    if hasattr(mob, 'orig_alpha_pixel_array'):
+        mob.orig_alpha_pixel_array = pixels[:, :, 3].copy()
+    if getattr(mob, 'fill_opacity', 1) < 1:
+        mob.set_opacity(mob.fill_opacity)
+    entry['loaded'] = entry['height']
+
+
+def install():
+    if getattr(image_mobject.ImageMobject.__init__, '_cached', False):
+        return
+    image_mobject.ImageMobject.__init__ = _cachedInit(image_mobject.ImageMobject.__init__)
+    image_mobject.ImageMobject.__init__._cached = True
+
+
+def clear():
+    # drop the decoded pixels; ImageMobject keeps its own copy, so only later uses re-decode
+    _decoded.clear()
+
+
+def observe(mobjects):
+    # note the on-screen height of every cached image among mobjects' families, and
+    # never let a resampled copy be shown above its own resolution
+    for mob in mobjects:
+        for m in mob.get_family():
+            if m in _shown:
+                entry = _shown[m]
+                px = math.ceil(m.get_height() / config.frame_height * config.pixel_height)
+                _largest[entry['key']] = max(_largest.get(entry['key'], 0), px)
+                if px > entry['loaded'] < entry['height']:
+                    _restoreFullResolution(m, entry)
+
+
+def save():
+    for key, px in _largest.items():
+        sizes = _sizes(key)
+        if sizes.get(str(config.pixel_height), 0) < px:
+            sizes[str(config.pixel_height)] = px
+            _atomicWrite(os.path.join(cacheDir('images'), f'{key}.json'), json.dumps(sizes).encode())
+    _largest.clear()
@@ -0,0 +1,88 @@
+# Section scopes: everything a section adds to the scene is tracked, and once the
+# section has wiped it, the mobjects that left the scene have their updaters
+# detached and their point/pixel buffers dropped, so the trackers, interpolators
+# and data arrays those updaters close over can be freed before the next section.
+import gc
+import json
+import os
+import resource
+
+import numpy as np
+from manim import ImageMobject, logger
+
+import imagecache
+from datasets import openDataset
+
+BUFFERS = ['points', 'pixel_array']
+
+
+def rssBytes():
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peakRssBytes()
+
+
+def peakRssBytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SectionScope:
+    def __init__(self, scene, name):
+        self.scene = scene
+        self.name = name
+        self.tracked = {}
+        self.report = None
+
+    def track(self, mobjects):
+        for mob in mobjects:
+            self.tracked[id(mob)] = mob
+
+    def __enter__(self):
+        self.scene.scope = self
+        self._rss = rssBytes()
+        return self
+
+    def __exit__(self, *exc):
+        self.scene.scope = None
+        if exc[0] is None:
+            self.release()
+        return False
+
+    def release(self):
+        scene = self.scene
+        kept = {id(m) for mob in scene.mobjects for m in mob.get_family()}
+        kept.update(id(m) for mob in scene.foreground_mobjects for m in mob.get_family())
+        mobjects, updaters = 0, 0
+        for mob in self.tracked.values():
+            for m in mob.get_family():
+                if id(m) in kept:
+                    continue
+                updaters += len(m.updaters)
+                m.clear_updaters(recursive=False)
+                for attr in BUFFERS:
+                    if isinstance(getattr(m, attr, None), np.ndarray):
+                        setattr(m, attr, np.zeros((1, 1, 4), dtype=np.uint8)
+                                if isinstance(m, ImageMobject) and attr == 'pixel_array'
+                                else np.zeros((0, 3)))
+                mobjects += 1
+        self.tracked.clear()
+        # the last play() (the wipe) still references the removed mobjects
+        scene.animations = None
+        scene.moving_mobjects = []
+        openDataset.cache_clear()
+        imagecache.clear()
+        gc.collect()
+        self.report = {'section': self.name, 'released_mobjects': mobjects,
+                       'detached_updaters': updaters,
+                       'rss_start_mb': self._rss / 2**20, 'rss_end_mb': rssBytes() / 2**20,
+                       'peak_rss_mb': peakRssBytes() / 2**20}
+        logger.info('%(section)s: released %(released_mobjects)d mobjects, %(detached_updaters)d updaters; '
+                    'rss %(rss_start_mb).0f -> %(rss_end_mb).0f MB (peak %(peak_rss_mb).0f MB)', self.report)
+        return self.report
+
+
+def saveReport(reports, path):
+    with open(path, 'w') as fh:
+        json.dump(reports, fh, indent=2)
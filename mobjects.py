@@ -0,0 +1,93 @@
+from manim import DEFAULT_DOT_RADIUS, Dot, VGroup, VMobject
+import numpy as np
+
+
+class SweepTrace(VMobject):
+    # traced path whose bezier points live in a preallocated, growable buffer;
+    # each corner writes 4 points in place instead of copying the whole path.
+    # With a tolerance, a new point that keeps the current run of corners within
+    # tolerance of one straight segment moves that segment's end instead of adding
+    # a corner (sector-bound polyline simplification, O(1) per point)
+    def __init__(self, start, capacity=256, tolerance=0, **kwargs):
+        super().__init__(**kwargs)
+        self.tolerance = tolerance
+        self._buffer = np.zeros((4 * capacity, 3))
+        self._buffer[:4] = start
+        self._n = 4
+        self.points = self._view = self._buffer[:self._n]
+        self._startRun(np.array(start, dtype=float), None)
+
+    def _reserve(self, n):
+        if self.points is not self._view:
+            # points were replaced (shift, become, copy...): adopt the new array
+            self._n = len(self.points)
+            self._buffer = np.zeros((max(2 * self._n, 4 * 256), 3))
+            self._buffer[:self._n] = self.points
+            self._run = None
+        if self._n + n > len(self._buffer):
+            buffer = np.zeros((2 * (self._n + n), 3))
+            buffer[:self._n] = self._buffer[:self._n]
+            self._buffer = buffer
+
+    def _startRun(self, start, point):
+        self._run = start
+        self._reach, self._window = 0.0, None
+        if point is not None:
+            self._extendsRun(point)
+
+    def _extendsRun(self, point):
+        if self._run is None:
+            return False
+        d = point[:2] - self._run[:2]
+        r = np.hypot(*d)
+        if r <= self.tolerance:
+            ok = self._reach <= self.tolerance
+        else:
+            angle = np.arctan2(d[1], d[0])
+            if self._window is None:
+                self._window = [angle, -np.pi, np.pi]
+            base, lo, hi = self._window
+            rel = (angle - base + np.pi) % (2 * np.pi) - np.pi
+            ok = lo <= rel <= hi and r >= self._reach - self.tolerance
+            if ok:
+                spread = np.arcsin(self.tolerance / r)
+                self._window[1:] = max(lo, rel - spread), min(hi, rel + spread)
+        if ok:
+            self._reach = max(self._reach, r)
+        return ok
+
+    def add_corner(self, point):
+        point = np.asarray(point, dtype=float)
+        self._reserve(4)
+        if self.tolerance and self._extendsRun(point):
+            self._buffer[self._n - 4:self._n] = np.linspace(self._run, point, 4)
+        else:
+            last = self._buffer[self._n - 1].copy()
+            self._buffer[self._n:self._n + 4] = np.linspace(last, point, 4)
+            self._n += 4
+            if self.tolerance:
+                self._startRun(last, point)
+        self.points = self._view = self._buffer[:self._n]
+        return self
+
+
+class SweepDots(VGroup):
+    # many dots as one mobject per colour: every centre lives in one (N, 3) array
+    # and all dot outlines are rewritten together in one vectorized step
+    def __init__(self, positions, colors, radius=DEFAULT_DOT_RADIUS, **kwargs):
+        super().__init__(**kwargs)
+        self.positions = np.array(positions, dtype=float)
+        self._shape = Dot(radius=radius).points
+        self._groups = []
+        for color in dict.fromkeys(str(c) for c in colors):
+            idx = np.array([i for i, c in enumerate(colors) if str(c) == color])
+            mob = VMobject(fill_color=color, fill_opacity=1, stroke_width=0)
+            self._groups.append((mob, idx))
+            self.add(mob)
+        self.move_dots(self.positions)
+
+    def move_dots(self, positions):
+        self.positions[:] = positions
+        for mob, idx in self._groups:
+            mob.points = (self._shape[None] + self.positions[idx][:, None]).reshape(-1, 3)
+        return self
@@ -0,0 +1,64 @@
+# Opt-in timing of updaters and play() calls, exported in the Chrome trace
+# event format (open in chrome://tracing or https://ui.perfetto.dev).
+import functools
+import json
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Profiler:
+    def __init__(self, scene, path, allocations=False):
+        self.scene = scene
+        self.path = path
+        self.section = None
+        self.events = []
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.allocations = allocations
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._start = time.perf_counter()
+
+    def _args(self):
+        return {'section': self.section,
+                'slide': getattr(self.scene, '_current_slide', None),
+                'frame': int(round(self.scene.renderer.time * self.scene.camera.frame_rate))}
+
+    def _record(self, name, start, end, alloc):
+        args = self._args()
+        if alloc is not None:
+            args['alloc_bytes'] = alloc
+        self.events.append({'name': name, 'cat': self.section or '', 'ph': 'X',
+                            'ts': (start - self._start) * 1e6, 'dur': (end - start) * 1e6,
+                            'pid': os.getpid(), 'tid': 0, 'args': args})
+        self.calls[name] += 1
+        self.seconds[name] += end - start
+
+    @contextmanager
+    def span(self, name):
+        before = tracemalloc.get_traced_memory()[0] if self.allocations else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            alloc = tracemalloc.get_traced_memory()[0] - before if self.allocations else None
+            self._record(name, start, end, alloc)
+
+    def wrap(self, name, updater):
+        # keeps the updater's signature so manim still passes dt when it asks for it
+        @functools.wraps(updater)
+        def timed(*args, **kwargs):
+            with self.span(name):
+                return updater(*args, **kwargs)
+        return timed
+
+    def save(self):
+        summary = {name: {'calls': self.calls[name], 'seconds': self.seconds[name]}
+                   for name in self.calls}
+        with open(self.path, 'w') as fh:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms',
+                       'otherData': {'scene': type(self.scene).__name__, 'summary': summary}}, fh)
@@ -0,0 +1,216 @@
+# Render every section of Slides.py as an independent scene in parallel, then
+# stitch the per-section decks back into slides/Slides.json and slides.html.
+#
+#   python render.py [--jobs N] [--sections B_TOC H_Conclusion] [--force]
+#                    [--reversed [SLIDE ...]] [--draft [STRIDE] [--refine]] [--preload N]
+#                    [-- manim args, e.g. -qh]
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from Slides import SECTIONS
+from assets import STORE, prune, reverse, reverseClip, storeDeck, writeHtml
+
+FOLDER = 'slides'
+SCENE = 'Slides'
+CACHE = f'{FOLDER}/cache.json'
+DRAFT = 'Draft'
+
+
+def hashFiles(paths):
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.encode())
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def localModules(path):
+    # the modules next to path that it imports, directly or through each other
+    folder, found, todo = os.path.dirname(path), set(), [path]
+    while todo:
+        with open(todo.pop()) as fh:
+            tree = ast.parse(fh.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(folder, f'{name}.py')
+                if os.path.exists(module) and module not in found:
+                    found.add(module)
+                    todo.append(module)
+    return found
+
+
+def dataFiles(strings):
+    # './images/3b1b_', './h11_3_112823/ray', '/data/h11_2_112123' -> every file under a
+    # matching path, plus the .axd file of a dataset directory or of a group's dataset
+    files = set()
+    for s in strings:
+        if '/' not in s:
+            continue
+        head, prefix = os.path.split(os.path.normpath(s))
+        if not os.path.isdir(head or '.'):
+            continue
+        for name in os.listdir(head or '.'):
+            path = os.path.join(head, name) if head else name
+            if name.startswith(prefix) if prefix else True:
+                if os.path.isdir(path):
+                    files.update(os.path.join(d, f) for d, _, fs in os.walk(path) for f in fs)
+                else:
+                    files.add(path)
+        for root in [os.path.normpath(s), head]:
+            if root and os.path.exists(f'{root}.axd'):
+                files.add(f'{root}.axd')
+    return files
+
+
+def fingerprints(manim_args=(), path='Slides.py'):
+    # section source + everything outside the sections + the data each section names
+    with open(path) as fh:
+        source = fh.read()
+    tree = ast.parse(source)
+    nodes = {n.name: n for n in ast.walk(tree)
+             if isinstance(n, ast.FunctionDef) and n.name in SECTIONS}
+    shared = source
+    for node in nodes.values():
+        shared = shared.replace(ast.get_source_segment(source, node), '')
+    shared = hashlib.sha256(shared.encode()).hexdigest()
+    modules = hashFiles(localModules(path))
+
+    result = {}
+    for name, node in nodes.items():
+        strings = [c.value for c in ast.walk(node)
+                   if isinstance(c, ast.Constant) and isinstance(c.value, str)]
+        h = hashlib.sha256()
+        for part in [ast.get_source_segment(source, node), shared, modules,
+                     hashFiles(dataFiles(strings)), *manim_args]:
+            h.update(part.encode())
+        result[name] = h.hexdigest()
+    return result
+
+
+def isCached(name, fingerprint, cache, folder=FOLDER, scene=SCENE):
+    if cache.get(name) != fingerprint or not os.path.exists(f'{folder}/{scene}_{name}.json'):
+        return False
+    with open(f'{folder}/{scene}_{name}.json') as fh:
+        slides = json.load(fh)['slides']
+    return all(os.path.exists(s[k]) for s in slides for k in ['file', 'rev_file'])
+
+
+def renderSection(name, manim_args=(), scene=SCENE):
+    env = dict(os.environ, SLIDES_SECTION=name, SLIDES_DRAFT='1' if scene == DRAFT else '')
+    cmd = ['manim-slides', 'render', *manim_args, 'Slides.py', f'{scene}_{name}']
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'{name} failed:\n{result.stderr}')
+    return name
+
+
+def stitch(sections, folder=FOLDER, scene=SCENE, store=STORE):
+    # concatenate the per-section slide lists in deck order, pointing into the asset store
+    deck = None
+    for name in sections:
+        with open(f'{folder}/{scene}_{name}.json') as fh:
+            part = json.load(fh)
+        if deck is None:
+            deck = part
+        else:
+            deck['slides'] += part['slides']
+    return storeDeck(deck, store)
+
+
+def saveDeck(deck, folder=FOLDER, scene=SCENE):
+    with open(f'{folder}/{scene}.json', 'w') as fh:
+        json.dump(deck, fh, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--sections', nargs='+', default=SECTIONS, choices=SECTIONS)
+    parser.add_argument('--html', default='slides.html')
+    parser.add_argument('--force', action='store_true', help='ignore the render cache')
+    parser.add_argument('--reversed', nargs='*', type=int, metavar='SLIDE',
+                        help='make reversed clips for these slide indices (all if none given)')
+    parser.add_argument('--draft', type=int, nargs='?', const=3, metavar='STRIDE',
+                        help='480p preview keeping every STRIDE-th frame with waits collapsed, '
+                             'written to slides_draft.html')
+    parser.add_argument('--refine', action='store_true',
+                        help='after a draft, start the full-quality render in the background')
+    parser.add_argument('--preload', type=int, default=2, metavar='N',
+                        help='slides.html buffers the videos of the next N slides')
+    args, manim_args = parser.parse_known_args(argv)
+    manim_args = [a for a in manim_args if a != '--']
+
+    scene, store, cache_path, html = SCENE, STORE, CACHE, args.html
+    if args.draft:
+        scene, store, cache_path = DRAFT, f'{FOLDER}/draft_assets', f'{FOLDER}/cache_{DRAFT}.json'
+        html = 'slides_draft.html' if html == 'slides.html' else html
+        full_args = manim_args
+        manim_args = ['-ql', '--frame_rate', str(15 / args.draft), *manim_args]
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as fh:
+            cache = json.load(fh)
+    prints = fingerprints(manim_args)
+    todo = [n for n in args.sections if args.force or not isCached(n, prints[n], cache, scene=scene)]
+    for name in set(args.sections) - set(todo):
+        print(f'cached {name}')
+    # the deck is stitched from every section, so ones never rendered are rendered too
+    for name in SECTIONS:
+        if name not in args.sections and not os.path.exists(f'{FOLDER}/{scene}_{name}.json'):
+            print(f'{name} has not been rendered yet, rendering it too')
+            todo.append(name)
+
+    # with a bare --reversed, each section's clips are reversed as soon as it is
+    # rendered, alongside the sections still rendering
+    reversing = []
+    with ThreadPoolExecutor(args.jobs) as pool, ThreadPoolExecutor(args.jobs) as reverser:
+        def reverseSection(name):
+            if args.reversed == []:
+                part = stitch([name], scene=scene, store=store)
+                reversing.extend(reverser.submit(reverseClip, s['file']) for s in part['slides'])
+
+        for name in set(args.sections) - set(todo):
+            reverseSection(name)
+        for future in as_completed(pool.submit(renderSection, n, manim_args, scene) for n in todo):
+            name = future.result()
+            cache[name] = prints[name]
+            with open(cache_path, 'w') as fh:
+                json.dump(cache, fh, indent=2)
+            print(f'rendered {name}')
+            reverseSection(name)
+    for future in reversing:
+        future.result()
+
+    deck = stitch(SECTIONS, scene=scene, store=store)
+    if args.reversed is not None:
+        reverse(deck, set(args.reversed) if args.reversed else None, args.jobs)
+    saveDeck(deck, scene=scene)
+    prune(deck, store)
+    writeHtml(deck, html, preload=args.preload)
+
+    if args.draft and args.refine:
+        with open(f'{FOLDER}/refine.log', 'w') as log:
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), '--jobs', str(args.jobs),
+                              '--sections', *args.sections, '--preload', str(args.preload),
+                              '--', *full_args],
+                             stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        print(f'refining to full quality in the background, see {FOLDER}/refine.log')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Local static server for presenting slides.html, with HTTP range requests so the
+# browser can start a video and seek in it without downloading it first. Clips in
+# the asset stores are named by their content hash and are served as immutable.
+#
+#   python serve.py [--port 8000] [--bind 127.0.0.1] [--open] [page]
+import argparse
+import os
+import re
+import sys
+import webbrowser
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    def end_headers(self):
+        self.send_header('Accept-Ranges', 'bytes')
+        if self.translate_path(self.path).endswith('.mp4'):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        super().end_headers()
+
+    def send_head(self):
+        # a single 'bytes=start-end' range gets a 206; anything else is served whole
+        self.remaining = None
+        path = self.translate_path(self.path)
+        match = RANGE.fullmatch(self.headers.get('Range', '').strip())
+        if match is None or match.groups() == ('', '') or not os.path.isfile(path):
+            return super().send_head()
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            self.send_error(404, 'File not found')
+            return None
+        size = os.fstat(fh.fileno()).st_size
+        first, last = match.groups()
+        if first == '':
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            fh.close()
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Last-Modified', self.date_time_string(os.fstat(fh.fileno()).st_mtime))
+        self.end_headers()
+        fh.seek(start)
+        self.remaining = end - start + 1
+        return fh
+
+    def copyfile(self, source, outputfile):
+        # browsers drop video connections as soon as they have buffered enough
+        try:
+            if self.remaining is None:
+                return super().copyfile(source, outputfile)
+            while self.remaining > 0:
+                block = source.read(min(1 << 16, self.remaining))
+                if not block:
+                    break
+                outputfile.write(block)
+                self.remaining -= len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('page', nargs='?', default='slides.html')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--directory', default=os.getcwd())
+    parser.add_argument('--open', action='store_true', help='open the page in the default browser')
+    args = parser.parse_args(argv)
+
+    handler = partial(RangeRequestHandler, directory=args.directory)
+    with ThreadingHTTPServer((args.bind, args.port), handler) as server:
+        url = f'http://{args.bind}:{server.server_address[1]}/{args.page}'
+        print(f'serving {args.directory} at {url}')
+        if args.open:
+            webbrowser.open(url)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
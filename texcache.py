@@ -0,0 +1,233 @@
+# Persistent caches for Text/Tex setup:
+#  - parsed SVG outlines of every SVGMobject (Text, Tex, MathTex, ...) pickled under
+#    <media_dir>/cache/outlines, shared by all render processes, evicted oldest-first
+#    once the directory grows past OUTLINE_CACHE_BYTES;
+#  - before a section runs, the Tex expressions it will need (the ones it compiled
+#    last time, plus the string literals it passes to Tex, MathTex and axis labels,
+#    and the digits of any numbers it shows) that are missing from <media_dir>/Tex
+#    are compiled together in one LaTeX run.
+import ast
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+import subprocess
+import tempfile
+
+from manim import config
+import manim.mobject.svg.svg_mobject as svg_mobject
+from manim.mobject.text.tex_mobject import SingleStringMathTex
+import manim.mobject.text.tex_mobject as tex_mobject
+import manim.utils.tex_file_writing as tex_file_writing
+from manim.utils.iterables import hash_obj
+
+# call name -> tex environment of the expression it compiles from its first argument
+TEX_CALLS = {'Tex': 'center', 'MathTex': 'align*',
+             'get_x_axis_label': 'align*', 'get_y_axis_label': 'align*'}
+# calls that typeset numbers, one MathTex per character
+NUMBER_CALLS = {'Axes', 'NumberLine', 'NumberPlane', 'DecimalNumber', 'Integer'}
+DIGITS = '0123456789.-+'
+
+OUTLINE_CACHE_BYTES = int(os.environ.get('SLIDES_OUTLINE_CACHE_MB', 512)) * 2**20
+
+_section = None
+_expressions = {}
+
+
+def cacheDir(name):
+    path = os.path.join(config.media_dir, 'cache', name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _atomicWrite(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def evict(directory, limit=OUTLINE_CACHE_BYTES):
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.pkl'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _outlineKey(mob):
+    h = hashlib.sha256(repr(mob.hash_seed).encode())
+    with open(mob.get_file_path(), 'rb') as fh:
+        h.update(fh.read())
+    return h.hexdigest()
+
+
+def _cachedInitSvg(init):
+    def init_svg_mobject(self, use_svg_cache):
+        if not use_svg_cache or hash_obj(self.hash_seed) in svg_mobject.SVG_HASH_TO_MOB_MAP:
+            return init(self, use_svg_cache)
+        path = os.path.join(cacheDir('outlines'), _outlineKey(self) + '.pkl')
+        try:
+            with open(path, 'rb') as fh:
+                submobjects = pickle.load(fh)
+            os.utime(path)
+            self.add(*submobjects)
+            svg_mobject.SVG_HASH_TO_MOB_MAP[hash_obj(self.hash_seed)] = self.copy()
+            return
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # unreadable (truncated, or pickled by another manim version): rebuild it
+            self.submobjects = []
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        init(self, use_svg_cache)
+        try:
+            _atomicWrite(path, pickle.dumps(self.submobjects))
+            evict(os.path.dirname(path))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            pass
+    return init_svg_mobject
+
+
+def _recordingTexToSvg(tex_to_svg_file):
+    def recorded(expression, environment=None, tex_template=None):
+        if _section is not None:
+            _expressions.setdefault(_section, {})[(expression, environment)] = None
+        return tex_to_svg_file(expression, environment, tex_template)
+    return recorded
+
+
+def install():
+    if getattr(svg_mobject.SVGMobject.init_svg_mobject, '_cached', False):
+        return
+    svg_mobject.SVGMobject.init_svg_mobject = _cachedInitSvg(svg_mobject.SVGMobject.init_svg_mobject)
+    svg_mobject.SVGMobject.init_svg_mobject._cached = True
+    recorded = _recordingTexToSvg(tex_file_writing.tex_to_svg_file)
+    tex_file_writing.tex_to_svg_file = recorded
+    tex_mobject.tex_to_svg_file = recorded
+
+
+def _manifest(section):
+    return os.path.join(cacheDir('tex'), f'{section}.json')
+
+
+def _callName(call):
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def literalTex(path, section):
+    # (expression, environment) for the literal Tex strings used by the function
+    # `section` in path and by the local functions it calls, expressions modified
+    # the way SingleStringMathTex does before compiling them
+    with open(path) as fh:
+        tree = ast.parse(fh.read())
+    functions = {n.name: n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)}
+    modify = getattr(object.__new__(SingleStringMathTex), '_get_modified_expression', str.strip)
+    items, seen, todo = {}, set(), [section]
+    while todo:
+        name = todo.pop()
+        if name in seen or name not in functions:
+            continue
+        seen.add(name)
+        for call in ast.walk(functions[name]):
+            if not isinstance(call, ast.Call):
+                continue
+            called = _callName(call)
+            todo.append(called)
+            if called in NUMBER_CALLS:
+                items.update(((d, 'align*'), None) for d in DIGITS)
+            if called in TEX_CALLS and len(call.args) >= 1 and isinstance(call.args[0], ast.Constant) \
+                    and isinstance(call.args[0].value, str) and (len(call.args) == 1 or called.startswith('get_')):
+                items[modify(call.args[0].value), TEX_CALLS[called]] = None
+    return list(items)
+
+
+def beginSection(section, source=None):
+    # batch-compile what this section used last time and the Tex it names in source,
+    # then record what it uses now
+    global _section
+    _section = section
+    items = literalTex(source, section) if source else []
+    if os.path.exists(_manifest(section)):
+        with open(_manifest(section)) as fh:
+            items += [tuple(e) for e in json.load(fh)]
+    batchCompile(list(dict.fromkeys(items)))
+
+
+def endSection():
+    global _section
+    if _section in _expressions:
+        _atomicWrite(_manifest(_section), json.dumps(list(_expressions[_section])).encode())
+    _section = None
+
+
+def batchCompile(items, tex_template=None):
+    # one LaTeX run for every (expression, environment) whose SVG is missing: each
+    # expression becomes one page of a multi-page standalone document, and page i
+    # is written where manim looks for that expression's SVG
+    tex_template = tex_template or config.tex_template
+    todo = []
+    for expression, environment in items:
+        tex_file = tex_file_writing.generate_tex_file(expression, environment, tex_template)
+        if not tex_file.with_suffix('.svg').exists():
+            todo.append(tex_file)
+    if len(todo) < 2:
+        return 0
+
+    preamble, bodies = None, []
+    for tex_file in todo:
+        code = tex_file.read_text()
+        head, rest = code.split('\\begin{document}', 1)
+        if preamble is None:
+            preamble = head
+        elif head != preamble:
+            return 0
+        bodies.append(rest.split('\\end{document}', 1)[0])
+    if not re.search(r'\\documentclass\[preview\]\{standalone\}', preamble):
+        return 0
+    preamble = preamble.replace('\\documentclass[preview]{standalone}',
+                                '\\documentclass[preview,multi=manimpage]{standalone}')
+    document = (preamble + '\\newenvironment{manimpage}{}{}\n\\begin{document}\n'
+                + '\n'.join(f'\\begin{{manimpage}}{b}\\end{{manimpage}}' for b in bodies)
+                + '\n\\end{document}\n')
+
+    # the work directory sits next to the SVGs, so each page lands with an atomic
+    # rename and a concurrent render never parses a half-written file
+    with tempfile.TemporaryDirectory(dir=todo[0].parent) as work:
+        with open(f'{work}/batch.tex', 'w') as fh:
+            fh.write(document)
+        out = 'dvi' if tex_template.output_format == '.dvi' else 'xdv'
+        compiled = subprocess.run(
+            [tex_template.tex_compiler, '-interaction=batchmode', '-halt-on-error',
+             *(['-no-pdf'] if out == 'xdv' else []), 'batch.tex'], cwd=work, capture_output=True)
+        if compiled.returncode != 0:
+            return 0
+        converted = subprocess.run(
+            ['dvisvgm', f'batch.{out}', '--page=1-', '-n', '-v', '0', '-o', 'batch-%p.svg'],
+            cwd=work, capture_output=True)
+        if converted.returncode != 0:
+            return 0
+        pages = {int(re.search(r'-(\d+)\.svg$', p).group(1)): p for p in glob.glob(f'{work}/batch-*.svg')}
+        if len(pages) != len(todo):
+            return 0
+        for (_, page), tex_file in zip(sorted(pages.items()), todo):
+            os.replace(page, tex_file.with_suffix('.svg'))
+    return len(todo)
@@ -0,0 +1,158 @@
+import hashlib
+import itertools
+import os
+
+import numpy as np
+
+from datasets import Dataset, writeArrays
+
+
+class TrajectoryBundle:
+    # all sampled quantities driven by one ValueTracker, stored as the columns
+    # of one contiguous array and interpolated together once per tracker value
+    def __init__(self, t, **columns):
+        order = np.argsort(t, kind='stable')
+        self.t = np.ascontiguousarray(np.asarray(t, dtype=float)[order])
+        self.slices = {}
+        blocks = []
+        start = 0
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=float).reshape(len(self.t), -1)
+            self.slices[name] = slice(start, start + values.shape[1])
+            start += values.shape[1]
+            blocks.append(values)
+        data = np.hstack(blocks)
+        self.fill = data[-1].copy()
+        self.data = np.ascontiguousarray(data[order])
+        self._value = None
+        self._row = None
+
+    def __call__(self, value):
+        # matches interp1d(..., bounds_error=False, fill_value=y[-1]) per column
+        if value != self._value:
+            if self.t[0] <= value <= self.t[-1]:
+                i = np.clip(np.searchsorted(self.t, value), 1, len(self.t) - 1)
+                t0, t1 = self.t[i - 1], self.t[i]
+                w = (value - t0) / (t1 - t0) if t1 != t0 else 0.0
+                self._row = (1 - w) * self.data[i - 1] + w * self.data[i]
+            else:
+                self._row = self.fill
+            self._value = value
+        return self._row
+
+    def f(self, name, j=0):
+        i = self.slices[name].start + j
+        return lambda value: self(value)[i]
+
+
+def _linear(tri, samples, points, tol=1e-9):
+    # linear interpolation over a Delaunay triangulation, NaN outside its hull; the
+    # tolerance keeps samples on a straight hull edge, which qhull may leave out of
+    # every simplex by rounding, inside
+    simplex = tri.find_simplex(points, tol=tol)
+    transform = tri.transform[simplex]
+    b = np.einsum('nij,nj->ni', transform[:, :-1], points - transform[:, -1])
+    b = np.hstack([b, 1 - b.sum(axis=1, keepdims=True)])
+    result = np.einsum('ni,nik->nk', b, samples[tri.simplices[simplex]])
+    result[simplex < 0] = np.nan
+    return result
+
+
+class ModuliGrid:
+    # scattered samples over the Kahler cone, resampled once onto a regular grid by
+    # linear interpolation over their Delaunay triangulation; afterwards any batch of
+    # points is evaluated by vectorized multilinear interpolation. Grid nodes outside
+    # the samples' hull are NaN; a point in a cell that has such a node is evaluated
+    # over the triangulation itself, which decides inside/outside exactly (NaN outside).
+    # fromSamples caches the grid, with the samples, as an .axd file keyed by its inputs
+    def __init__(self, axes, values, points=None, samples=None):
+        self.axes = [np.asarray(a, dtype=float) for a in axes]
+        self.values = np.asarray(values, dtype=float)
+        self.points = points
+        self.samples = samples
+        self._valid = ~np.isnan(self.values).any(axis=-1)
+        self._filled = np.where(self._valid[..., None], self.values, 0)
+        self._tri = None
+
+    def _interpolate(self, points):
+        # over the samples' triangulation, built on first use
+        if self.points is None:
+            return np.full((len(points), self.values.shape[-1]), np.nan)
+        if self._tri is None:
+            from scipy.spatial import Delaunay
+            self._tri = Delaunay(np.asarray(self.points))
+        return _linear(self._tri, np.asarray(self.samples), points)
+
+    @classmethod
+    def fromSamples(cls, points, values, shape=256, bounds=None, cache=None, tolerance=0.05):
+        # tolerance: how far (as a fraction of each column's range) the grid may miss a
+        # sample before it is rejected as too coarse
+        points = np.ascontiguousarray(points, dtype=float)
+        values = np.ascontiguousarray(np.asarray(values, dtype=float).reshape(len(points), -1))
+        dims = points.shape[1]
+        shape = [shape] * dims if np.isscalar(shape) else list(shape)
+        bounds = bounds or list(zip(points.min(axis=0), points.max(axis=0)))
+        path = None
+        if cache is not None:
+            h = hashlib.sha256(points.tobytes() + values.tobytes())
+            h.update(repr((shape, [tuple(map(float, b)) for b in bounds])).encode())
+            path = os.path.join(cache, f'{h.hexdigest()[:32]}.axd')
+            if os.path.exists(path):
+                grid = Dataset(path)
+                if 'grid/samples' in grid:
+                    return cls([grid[f'grid/axis_{i}'] for i in range(dims)], grid['grid/values'],
+                               grid['grid/points'], grid['grid/samples'])
+
+        from scipy.spatial import Delaunay
+        axes = [np.linspace(lo, hi, n) for (lo, hi), n in zip(bounds, shape)]
+        mesh = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, dims)
+        tri = Delaunay(points)
+        grid = cls(axes, _linear(tri, values, mesh).reshape(*shape, values.shape[1]), points, values)
+        grid._tri = tri
+        inside = np.all([(p >= a[0]) & (p <= a[-1]) for p, a in zip(points.T, grid.axes)], axis=0)
+        error = np.abs(grid(points[inside]) - values[inside])
+        if np.isnan(error).any():
+            raise ValueError('the grid is NaN at some of its own samples')
+        if (error.max(axis=0, initial=0) > tolerance * np.ptp(values, axis=0)).any():
+            raise ValueError(f'a {shape} grid does not reproduce the samples; use a finer shape')
+        if path is not None:
+            writeArrays(path, {**{f'grid/axis_{i}': a for i, a in enumerate(axes)}, 'grid/values': grid.values,
+                               'grid/points': points, 'grid/samples': values},
+                        {'samples': len(points), 'shape': shape})
+        return grid
+
+    def __call__(self, points):
+        # (..., dims) -> (..., columns)
+        points = np.asarray(points, dtype=float)
+        flat = points.reshape(-1, len(self.axes))
+        index, weight = [], []
+        outside = np.zeros(len(flat), dtype=bool)
+        for d, axis in enumerate(self.axes):
+            p = flat[:, d]
+            outside |= (p < axis[0]) | (p > axis[-1])
+            i = np.clip(np.searchsorted(axis, p) - 1, 0, len(axis) - 2)
+            index.append(i)
+            weight.append((p - axis[i]) / (axis[i + 1] - axis[i]))
+        result = np.zeros((len(flat), self.values.shape[-1]))
+        edge = np.zeros(len(flat), dtype=bool)
+        for corner in itertools.product([0, 1], repeat=len(self.axes)):
+            w = np.ones(len(flat))
+            for c, wd in zip(corner, weight):
+                w *= wd if c else 1 - wd
+            node = tuple(i + c for i, c in zip(index, corner))
+            edge |= (w > 0) & ~self._valid[node]
+            result += w[:, None] * self._filled[node]
+        edge &= ~outside
+        if edge.any():
+            result[edge] = self._interpolate(flat[edge])
+        result[outside] = np.nan
+        return result.reshape(*points.shape[:-1], -1)
+
+    def path(self, waypoints, samples=200):
+        # piecewise-linear path through waypoints, sampled evenly by arc length;
+        # returns the points and the field along them
+        waypoints = np.asarray(waypoints, dtype=float)
+        lengths = np.r_[0, np.cumsum(np.linalg.norm(np.diff(waypoints, axis=0), axis=1))]
+        s = np.linspace(0, lengths[-1], samples)
+        points = np.stack([np.interp(s, lengths, w) for w in waypoints.T], axis=-1)
+        return points, self(points)